@@ -9,12 +9,18 @@ E-ラーニングシステム - Streamlit メインアプリケーション
 """
 
 import streamlit as st
-import pandas as pd
+import numpy as np
 import yaml
 import json
-import time
-from datetime import datetime
+import csv
+import hashlib
+from datetime import datetime, timedelta
 import os
+import io
+import atexit
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import smtplib
 from email.mime.text import MIMEText
@@ -35,7 +41,11 @@ st.set_page_config(
 # ==================================================
 # スタイル設定
 # ==================================================
-st.markdown("""
+
+@st.cache_resource
+def _styles():
+    """共通スタイルを返す（文字列は一度だけ生成して再利用）"""
+    return """
 <style>
     .main-title {
         color: #1f77b4;
@@ -63,7 +73,10 @@ st.markdown("""
         border-left: 5px solid #dc3545;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# スクリプトは再実行のたびに先頭から走るため、全ページに適用される
+st.markdown(_styles(), unsafe_allow_html=True)
 
 # ==================================================
 # 設定ファイル読み込み
@@ -75,6 +88,13 @@ def load_config():
     try:
         with open('config.yaml', 'r', encoding='utf-8') as f:
             config = yaml.safe_load(f)
+        
+        # 有効なテーマは読み込み時に一度だけ抽出しておく
+        config['_enabled_themes'] = {
+            theme_key: theme_config
+            for theme_key, theme_config in config['themes'].items()
+            if theme_config.get('enabled', False)
+        }
         return config
     except FileNotFoundError:
         st.error("❌ config.yaml が見つかりません")
@@ -82,94 +102,309 @@ def load_config():
 
 config = load_config()
 
-# ==================================================
-# ユーティリティ関数
-# ==================================================
+logger = logging.getLogger(__name__)
 
-def load_employees():
-    """employees.csv を読み込む"""
+@st.cache_resource
+def has_secrets(*keys):
+    """secrets.toml に指定のキーがすべて設定されているか確認（判定は一度だけ）"""
     try:
-        df = pd.read_csv(
-            config['authentication']['employee_csv_path'],
-            encoding='utf-8-sig'
-        )
-        return df
+        configured = all(st.secrets.get(key) for key in keys)
     except FileNotFoundError:
-        st.error(f"❌ {config['authentication']['employee_csv_path']} が見つかりません")
-        return None
+        configured = False
+    if not configured:
+        logger.warning("secrets.toml に %s の設定がありません", ", ".join(keys))
+    return configured
+
+# 外部連携を使うかどうか（未設定の場合は送信処理をすぐに打ち切る）
+_SHEETS_ENABLED = has_secrets("google_service_account")
+_SMTP_ENABLED = has_secrets("GMAIL_USER", "GMAIL_PASSWORD")
+
+# ==================================================
+# ユーティリティ関数
+# ==================================================
 
+@st.cache_resource
+def load_employees_index():
+    """employees.csv を読み込み、メールアドレスをキーにした辞書を返す（読み取り専用で共有）"""
+    with open(config['authentication']['employee_csv_path'], 'r',
+              encoding='utf-8-sig', newline='') as f:
+        return {row['メールアドレス']: row for row in csv.DictReader(f)}
+
+# 起動時に一度だけ読み込む（ファイルがなくてもアプリは起動する）
+try:
+    _EMPLOYEE_INDEX = load_employees_index()
+except FileNotFoundError:
+    _EMPLOYEE_INDEX = None
+except (KeyError, UnicodeDecodeError, csv.Error):
+    # 列名や文字コードが不正な場合もログに残してログイン時のエラー表示に任せる
+    logger.exception("employees.csv の読み込みに失敗しました")
+    _EMPLOYEE_INDEX = None
+
+@st.cache_data
 def load_questions(theme_key):
-    """テーマの問題ファイルを読み込む"""
-    try:
-        questions_path = config['themes'][theme_key]['questions_path']
-        with open(questions_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data.get('questions', [])
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        st.error(f"❌ 問題ファイルの読み込みに失敗しました: {str(e)}")
-        return None
+    """テーマの問題ファイルを読み込む（テーマごとにキャッシュ）"""
+    questions_path = config['themes'][theme_key]['questions_path']
+    with open(questions_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('questions', [])
+
+@st.cache_resource
+def read_pdf_bytes(path):
+    """PDF ファイルの内容を読み込む（パスごとに全セッションで共有）"""
+    return Path(path).read_bytes()
 
 def authenticate_user(email):
     """ユーザーを認証（employees.csv に登録されているか確認）"""
-    employees_df = load_employees()
-    if employees_df is None:
+    if _EMPLOYEE_INDEX is None:
+        st.error(f"❌ {config['authentication']['employee_csv_path']} が見つからないか、読み込めません")
         return None
+    return _EMPLOYEE_INDEX.get(email)
+
+@st.cache_resource(show_spinner=False)
+def get_smtp_local():
+    """スレッドごとの SMTP 接続を保持する領域を取得（プロセス内で共有）"""
+    return threading.local()
+
+def get_smtp_connection(host, port, user, password):
+    """再利用可能な SMTP 接続を取得（切断されていれば再接続）"""
+    local = get_smtp_local()
+    if not hasattr(local, 'connections'):
+        local.connections = {}
+    
+    key = (host, port, user)
+    server = local.connections.get(key)
+    if server is not None:
+        # RSET で接続が生きているか確認
+        try:
+            if server.rset()[0] == 250:
+                return server
+        except (smtplib.SMTPException, OSError):
+            pass
+        try:
+            server.close()
+        except OSError:
+            pass
+    
+    # 無通信のまま切断された接続で待ち続けないようにタイムアウトを設定
+    server = smtplib.SMTP(
+        host, port,
+        timeout=config['email_settings'].get('smtp_timeout_seconds', 10)
+    )
+    try:
+        server.starttls()
+        server.login(user, password)
+    except Exception:
+        # 認証や TLS に失敗した接続は閉じてから例外を伝える
+        server.close()
+        raise
+    local.connections[key] = server
+    return server
+
+def send_email_notifications(recipients, subject, body):
+    """メール通知を送信（1 つの SMTP 接続で全宛先に送信）"""
+    if not _SMTP_ENABLED:
+        return False
     
-    user = employees_df[employees_df['メールアドレス'] == email]
-    if len(user) > 0:
-        return user.iloc[0]
-    return None
-
-def send_email_notification(recipient, subject, body):
-    """メール通知を送信"""
     try:
         # 注：実際の運用では secrets.toml で GMAIL_USER, GMAIL_PASSWORD を設定
-        gmail_user = st.secrets.get("GMAIL_USER")
-        gmail_password = st.secrets.get("GMAIL_PASSWORD")
-        
-        if not gmail_user or not gmail_password:
-            st.warning("⚠️ メール送信の設定がありません")
-            return False
+        gmail_user = st.secrets["GMAIL_USER"]
+        gmail_password = st.secrets["GMAIL_PASSWORD"]
         
-        msg = MIMEMultipart()
-        msg['From'] = gmail_user
-        msg['To'] = recipient
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
+        smtp_args = (
+            config['email_settings']['smtp_server'],
+            config['email_settings']['smtp_port'],
+            gmail_user,
+            gmail_password
+        )
+        server = get_smtp_connection(*smtp_args)
         
-        server = smtplib.SMTP(config['email_settings']['smtp_server'], 
-                              config['email_settings']['smtp_port'])
-        server.starttls()
-        server.login(gmail_user, gmail_password)
-        server.send_message(msg)
-        server.quit()
+        all_sent = True
+        for recipient in recipients:
+            msg = MIMEMultipart()
+            msg['From'] = gmail_user
+            msg['To'] = recipient
+            msg['Subject'] = subject
+            
+            msg.attach(MIMEText(body, 'plain', 'utf-8'))
+            
+            # 1 件の失敗で残りの宛先への送信を止めない
+            try:
+                try:
+                    server.send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # 送信中に切断された場合は再接続して再送
+                    server = get_smtp_connection(*smtp_args)
+                    server.send_message(msg)
+            except smtplib.SMTPException:
+                logger.exception("メール送信エラー（宛先: %s）", recipient)
+                all_sent = False
         
-        return True
-    except Exception as e:
-        st.error(f"❌ メール送信エラー: {str(e)}")
+        return all_sent
+    except Exception:
+        logger.exception("メール送信エラー")
         return False
 
+@st.cache_resource(show_spinner=False)
+def get_spreadsheet():
+    """認証済みの Google Sheets スプレッドシートを取得（プロセス内で共有）
+
+    認証情報もここでキャッシュされるため、JWT の署名はプロセスごとに一度だけ行われ、
+    以降はアクセストークンが自動で更新される。
+    """
+    # キーが設定されていれば Drive の名前検索を省略して直接開く
+    spreadsheet_key = config['google_sheets'].get('spreadsheet_key')
+    
+    # 必要最小限のスコープのみ要求（名前で開く場合のみ Drive の検索権限が必要）
+    scopes = ["https://www.googleapis.com/auth/spreadsheets"]
+    if not spreadsheet_key:
+        scopes.append("https://www.googleapis.com/auth/drive.metadata.readonly")
+    
+    credentials = Credentials.from_service_account_info(
+        st.secrets["google_service_account"],
+        scopes=scopes
+    )
+    gc = gspread.authorize(credentials)
+    
+    if spreadsheet_key:
+        return gc.open_by_key(spreadsheet_key)
+    return gc.open(config['google_sheets']['spreadsheet_name'])
+
+class SheetsRowBuffer:
+    """Google Sheets への書き込みをまとめて送信するバッファ
+
+    行はメモリ上に溜めておき、件数が batch_size に達するか
+    flush_interval_seconds が経過した時点で Values API の追記により
+    1 回の API 呼び出しでまとめて書き込む。
+    書き込みに失敗した行はキューに戻し、間隔を倍々に延ばしながら再送する
+    （保持する行数は max_pending_rows まで）。
+    """
+
+    def __init__(self, batch_size, flush_interval, max_pending_rows,
+                 max_retry_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending_rows = max_pending_rows
+        self.max_retry_interval = max_retry_interval
+        self.pending_rows = []
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def _schedule(self, delay):
+        """delay 秒後の書き込みを予約する（lock を保持した状態で呼ぶ）"""
+        self.timer = threading.Timer(delay, self.flush)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def add(self, row):
+        """行をキューに追加し、必要に応じて書き込みを予約する"""
+        with self.lock:
+            self.pending_rows.append(row)
+            if len(self.pending_rows) >= self.batch_size and self.failures == 0:
+                # 上限に達したら呼び出し元を待たせずに即時書き込み
+                # （再送待ちの間は予約済みのタイマーに任せる）
+                threading.Thread(target=self.flush, daemon=True).start()
+            elif self.timer is None:
+                self._schedule(self.flush_interval)
+
+    def _take_rows(self):
+        """キューの行をすべて取り出し、予約済みの書き込みを取り消す"""
+        with self.lock:
+            rows, self.pending_rows = self.pending_rows, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        return rows
+
+    def _append(self, rows):
+        """行を Google Sheets に追記する"""
+        # ワークシートを取得せず、シート名の範囲に Values API で直接追記
+        sheet_range = gspread.utils.absolute_range_name(
+            config['google_sheets']['sheet_name']
+        )
+        get_spreadsheet().values_append(
+            sheet_range,
+            params={
+                'valueInputOption': 'RAW',
+                'insertDataOption': 'INSERT_ROWS'
+            },
+            body={'values': rows}
+        )
+
+    def flush(self):
+        """キューに溜まった行を Google Sheets に書き込む"""
+        rows = self._take_rows()
+        if not rows:
+            return
+
+        try:
+            self._append(rows)
+        except Exception:
+            logger.exception("Google Sheets 保存エラー（%d 件）", len(rows))
+            # 失敗した行はキューに戻し、間隔を延ばして再送を予約する
+            with self.lock:
+                self.pending_rows[:0] = rows
+                overflow = len(self.pending_rows) - self.max_pending_rows
+                dropped = self.pending_rows[:max(overflow, 0)]
+                del self.pending_rows[:max(overflow, 0)]
+                
+                self.failures += 1
+                if self.timer is None:
+                    self._schedule(min(
+                        self.flush_interval * 2 ** self.failures,
+                        self.max_retry_interval
+                    ))
+            
+            if dropped:
+                # 上限を超えた古い行は破棄し、内容をログに残す
+                logger.error(
+                    "Google Sheets の再送待ちが上限（%d 件）を超えたため %d 件を破棄しました: %s",
+                    self.max_pending_rows, len(dropped), dropped
+                )
+        else:
+            with self.lock:
+                self.failures = 0
+
+    def drain(self):
+        """終了時にキューに残った行を書き込む（失敗しても再送は予約しない）"""
+        rows = self._take_rows()
+        if not rows:
+            return
+
+        try:
+            self._append(rows)
+        except Exception:
+            # プロセスが終了するため、書き込めなかった行の内容をログに残す
+            logger.exception(
+                "終了時の Google Sheets 保存に失敗したため %d 件を破棄しました: %s",
+                len(rows), rows
+            )
+
+@st.cache_resource(show_spinner=False)
+def get_sheets_buffer():
+    """プロセス全体で共有する書き込みバッファを取得"""
+    buffer = SheetsRowBuffer(
+        config['google_sheets'].get('batch_size', 10),
+        config['google_sheets'].get('flush_interval_seconds', 5),
+        config['google_sheets'].get('max_pending_rows', 1000),
+        config['google_sheets'].get('max_retry_interval_seconds', 300)
+    )
+    # 終了時にキューに残った行を書き込む
+    atexit.register(buffer.drain)
+    return buffer
+
 def save_to_google_sheets(user_email, user_name, theme_title, score, time_spent, answers):
-    """Google Sheets に結果を保存"""
+    """Google Sheets に結果を保存（バッファ経由でまとめて書き込み）"""
+    # 注：実際の運用では secrets.toml で google_service_account を設定
+    if not _SHEETS_ENABLED:
+        return False
+    
     try:
-        # 注：実際の運用では secrets.toml で google_service_account を設定
-        credentials_dict = st.secrets.get("google_service_account")
-        if not credentials_dict:
-            st.warning("⚠️ Google Sheets の設定がありません")
-            return False
-        
-        credentials = Credentials.from_service_account_info(credentials_dict)
-        gc = gspread.authorize(credentials)
-        
-        spreadsheet = gc.open(config['google_sheets']['spreadsheet_name'])
-        worksheet = spreadsheet.worksheet(config['google_sheets']['sheet_name'])
-        
         # 新しい行を追加
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
         # 答えを ○/✕ で表現
-        answers_display = [('○' if ans else '✕') for ans in answers]
+        answers_display = np.where(answers, '○', '✕').tolist()
         
         row = [
             now,
@@ -182,19 +417,20 @@ def save_to_google_sheets(user_email, user_name, theme_title, score, time_spent,
             '-'  # メモ欄
         ]
         
-        worksheet.append_row(row)
+        get_sheets_buffer().add(row)
         return True
-    except Exception as e:
-        st.error(f"❌ Google Sheets 保存エラー: {str(e)}")
+    except Exception:
+        logger.exception("Google Sheets 保存エラー")
         return False
 
+@st.cache_resource(show_spinner=False)
+def get_executor():
+    """バックグラウンド処理用のスレッドプールを取得（プロセス内で共有）"""
+    return ThreadPoolExecutor(max_workers=4)
+
 def get_enabled_themes():
     """有効なテーマのリストを取得"""
-    enabled_themes = {}
-    for theme_key, theme_config in config['themes'].items():
-        if theme_config.get('enabled', False):
-            enabled_themes[theme_key] = theme_config
-    return enabled_themes
+    return config['_enabled_themes']
 
 # ==================================================
 # セッション状態の初期化
@@ -212,10 +448,14 @@ def init_session_state():
         st.session_state.selected_theme = None
     if 'start_time' not in st.session_state:
         st.session_state.start_time = None
+    if 'deadline' not in st.session_state:
+        st.session_state.deadline = None
     if 'quiz_answers' not in st.session_state:
-        st.session_state.quiz_answers = {}
+        st.session_state.quiz_answers = None
     if 'quiz_score' not in st.session_state:
         st.session_state.quiz_score = None
+    if 'submitted_ids' not in st.session_state:
+        st.session_state.submitted_ids = set()
 
 init_session_state()
 
@@ -257,8 +497,8 @@ def show_login_page():
                     st.session_state.user_email = email
                     st.session_state.user_name = user['フルネーム']
                     st.session_state.current_page = 'dashboard'
-                    st.success(f"✅ ログインしました！{user['フルネーム']}さん")
-                    time.sleep(1)
+                    # toast は rerun 後も表示が残るため待機は不要
+                    st.toast(f"✅ ログインしました！{user['フルネーム']}さん")
                     st.rerun()
                 else:
                     st.error("❌ このメールアドレスは登録されていません。\n\n管理者に確認してください。")
@@ -284,6 +524,15 @@ def show_dashboard():
             st.session_state.current_page = 'login'
             st.rerun()
     
+    # 管理者メニュー
+    if st.session_state.user_email in config['admins']:
+        with st.sidebar:
+            st.markdown("### 🔧 管理者メニュー")
+            if st.button("社員名簿を再読み込み", use_container_width=True):
+                load_employees_index.clear()
+                st.toast("✅ employees.csv を再読み込みしました")
+                st.rerun()
+    
     st.markdown("---")
     
     # 利用可能なテーマを表示
@@ -311,6 +560,9 @@ def show_dashboard():
                 st.session_state.selected_theme = theme_key
                 st.session_state.current_page = 'learning'
                 st.session_state.start_time = datetime.now()
+                st.session_state.deadline = st.session_state.start_time + timedelta(
+                    minutes=theme_config['time_limit_minutes']
+                )
                 st.rerun()
     
     st.markdown("---")
@@ -358,17 +610,21 @@ def show_learning_page():
     pdf_path = theme_config['pdf_path']
     
     if os.path.exists(pdf_path):
-        with open(pdf_path, 'rb') as pdf_file:
-            st.download_button(
-                label="PDF をダウンロード",
-                data=pdf_file.read(),
-                file_name=os.path.basename(pdf_path),
-                mime="application/pdf"
-            )
+        # 一度だけ読み込み、ダウンロードと表示の両方で使う
+        if config['system'].get('cache_pdfs', True):
+            pdf_bytes = read_pdf_bytes(pdf_path)
+        else:
+            pdf_bytes = Path(pdf_path).read_bytes()
+        
+        st.download_button(
+            label="PDF をダウンロード",
+            data=pdf_bytes,
+            file_name=os.path.basename(pdf_path),
+            mime="application/pdf"
+        )
         
         # PDF をブラウザで表示
-        with open(pdf_path, 'rb') as pdf_file:
-            st.pdfviewer(pdf_file)
+        st.pdfviewer(io.BytesIO(pdf_bytes))
     else:
         st.warning(f"⚠️ PDF が見つかりません: {pdf_path}")
 
@@ -384,12 +640,11 @@ def show_quiz_page():
     st.markdown(f'<div class="main-title">❓ {theme_config["title"]} - クイズ</div>', 
                 unsafe_allow_html=True)
     
-    time_limit = theme_config['time_limit_minutes']
     passing_score = theme_config['passing_score']
     
-    # 制限時間の計算
-    elapsed_time = (datetime.now() - st.session_state.start_time).total_seconds() / 60
-    remaining_time = time_limit - elapsed_time
+    # 制限時間の計算（締め切りは開始時に算出済み）
+    now = datetime.now()
+    remaining_seconds = (st.session_state.deadline - now).total_seconds()
     
     # タイマー表示
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -398,8 +653,9 @@ def show_quiz_page():
         st.markdown(f"**テーマ:** {theme_config['title']}")
     
     with col2:
-        if remaining_time > 0:
-            st.markdown(f"⏱️ **残り時間:** {int(remaining_time)}分 {int((remaining_time % 1) * 60)}秒")
+        if remaining_seconds > 0:
+            minutes, seconds = divmod(int(remaining_seconds), 60)
+            st.markdown(f"⏱️ **残り時間:** {minutes}分 {seconds}秒")
         else:
             st.error(f"⏱️ **時間超過！自動提出します...**")
             # 自動提出
@@ -414,74 +670,97 @@ def show_quiz_page():
     st.markdown("---")
     
     # 問題を読み込む
-    questions = load_questions(theme_key)
-    
-    if questions is None:
-        st.error("❌ 問題の読み込みに失敗しました")
+    try:
+        questions = load_questions(theme_key)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        st.error(f"❌ 問題ファイルの読み込みに失敗しました: {str(e)}")
         return
     
-    # 問題を表示
-    for i, question in enumerate(questions, 1):
-        with st.container():
-            st.markdown(f'<div class="question-box">', unsafe_allow_html=True)
-            
-            st.markdown(f"### 問題 {i} / {len(questions)}")
-            st.markdown(f"**{question['question']}**")
-            
-            # ラジオボタンで選択肢を表示
-            answer = st.radio(
-                "選択肢を選んでください",
-                question['options'],
-                key=f"q_{i}",
-                label_visibility="collapsed"
-            )
-            
-            # ユーザーの回答を記録
-            selected_index = question['options'].index(answer)
-            st.session_state.quiz_answers[i] = (selected_index == question['correct_answer'])
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-    
-    st.markdown("---")
-    
-    # 提出ボタン
-    col1, col2 = st.columns([1, 1])
+    # 回答の正誤を問題数分の配列で保持
+    quiz_answers = st.session_state.get('quiz_answers')
+    if quiz_answers is None or len(quiz_answers) != len(questions):
+        st.session_state.quiz_answers = np.zeros(len(questions), dtype=bool)
+    
+    # 問題を表示（フォーム内の回答は提出時にまとめて反映される）
+    with st.form("quiz_form"):
+        for i, question in enumerate(questions, 1):
+            with st.container():
+                st.markdown(f'<div class="question-box">', unsafe_allow_html=True)
+                
+                st.markdown(f"### 問題 {i} / {len(questions)}")
+                st.markdown(f"**{question['question']}**")
+                
+                # ラジオボタンで選択肢を表示
+                # （値は選択肢のインデックス。未選択の場合は None）
+                selected_index = st.radio(
+                    "選択肢を選んでください",
+                    options=list(range(len(question['options']))),
+                    format_func=question['options'].__getitem__,
+                    index=None,
+                    key=f"q_{i}",
+                    label_visibility="collapsed"
+                )
+                
+                # ユーザーの回答を記録（未回答は不正解）
+                st.session_state.quiz_answers[i - 1] = (selected_index == question['correct_answer'])
+                
+                st.markdown('</div>', unsafe_allow_html=True)
+        
+        st.markdown("---")
+        
+        # 提出ボタン
+        submitted = st.form_submit_button(
+            "答案を提出 →", use_container_width=True, type="primary"
+        )
     
-    with col1:
-        if st.button("← 教本に戻る", use_container_width=True):
-            st.session_state.current_page = 'learning'
-            st.rerun()
+    if st.button("← 教本に戻る", use_container_width=True):
+        st.session_state.current_page = 'learning'
+        st.rerun()
     
-    with col2:
-        if st.button("答案を提出 →", use_container_width=True, type="primary"):
-            # スコア計算
-            correct_count = sum(st.session_state.quiz_answers.values())
-            score = int((correct_count / len(questions)) * 100)
-            time_spent = int(elapsed_time)
-            
-            st.session_state.quiz_score = score
-            st.session_state.quiz_time_spent = time_spent
+    if submitted:
+        # 保存と通知はバックグラウンドで実行し、結果ページをすぐに表示する
+        # （エラーは画面ではなくログに記録される）
+        # セッション状態を変更する前に取得し、途中で中断されないようにする
+        executor = get_executor()
+        
+        # 二重送信の防止（同じ受講の答案は一度だけ保存・通知する）
+        submission_id = hashlib.md5(
+            f"{st.session_state.user_email}|{theme_key}|"
+            f"{st.session_state.start_time.isoformat()}".encode()
+        ).hexdigest()
+        if submission_id in st.session_state.submitted_ids:
             st.session_state.current_page = 'result'
-            
-            # Google Sheets に保存
-            answers_list = [st.session_state.quiz_answers.get(i + 1, False) 
-                           for i in range(len(questions))]
-            save_to_google_sheets(
-                st.session_state.user_email,
-                st.session_state.user_name,
-                theme_config['title'],
-                score,
-                f"{time_spent}分",
-                answers_list
-            )
-            
-            # メール通知
-            if config['email_settings']['send_on_completion']:
-                for admin in config['admins']:
-                    send_email_notification(
-                        admin,
-                        f"[E-ラーニング] {st.session_state.user_name}さんが完了しました",
-                        f"""
+            st.rerun()
+        st.session_state.submitted_ids.add(submission_id)
+        
+        # スコア計算
+        correct_count = int(st.session_state.quiz_answers.sum())
+        score = int((correct_count / len(questions)) * 100)
+        time_spent = int((now - st.session_state.start_time).total_seconds() // 60)
+        
+        st.session_state.quiz_score = score
+        st.session_state.quiz_time_spent = time_spent
+        st.session_state.current_page = 'result'
+        
+        # Google Sheets に保存（バックグラウンドで参照するため配列はコピーして渡す）
+        answers = st.session_state.quiz_answers.copy()
+        executor.submit(
+            save_to_google_sheets,
+            st.session_state.user_email,
+            st.session_state.user_name,
+            theme_config['title'],
+            score,
+            f"{time_spent}分",
+            answers
+        )
+        
+        # メール通知
+        if config['email_settings']['send_on_completion']:
+            executor.submit(
+                send_email_notifications,
+                config['admins'],
+                f"[E-ラーニング] {st.session_state.user_name}さんが完了しました",
+                f"""
 {st.session_state.user_name}さん（{st.session_state.user_email}）が
 「{theme_config['title']}」の学習を完了しました。
 
@@ -489,10 +768,30 @@ def show_quiz_page():
 - スコア: {score}点
 - 所要時間: {time_spent}分
 - 合否: {'合格 ✅' if score >= passing_score else '不合格 ❌'}
-                        """
-                    )
-            
-            st.rerun()
+                """
+            )
+        
+        # 再受講案内メール
+        if (config['email_settings']['send_on_retake_needed']
+                and score < passing_score):
+            executor.submit(
+                send_email_notifications,
+                config['admins'],
+                f"[E-ラーニング] {st.session_state.user_name}さんが再受講対象になりました",
+                f"""
+{st.session_state.user_name}さん（{st.session_state.user_email}）は
+「{theme_config['title']}」の再受講対象になりました。
+
+【結果】
+- スコア: {score}点
+- 合格点: {passing_score}点
+- 所要時間: {time_spent}分
+
+管理者より、フォローアップをお願いします。
+                """
+            )
+        
+        st.rerun()
 
 # ==================================================
 # ページ: 結果
@@ -541,25 +840,6 @@ def show_result_page():
             <p>教本を再度確認してから、再度受講することをお勧めします。</p>
         </div>
         """, unsafe_allow_html=True)
-        
-        # 再受講案内メール
-        if config['email_settings']['send_on_retake_needed']:
-            for admin in config['admins']:
-                send_email_notification(
-                    admin,
-                    f"[E-ラーニング] {st.session_state.user_name}さんが再受講対象になりました",
-                    f"""
-{st.session_state.user_name}さん（{st.session_state.user_email}）は
-「{theme_config['title']}」の再受講対象になりました。
-
-【結果】
-- スコア: {score}点
-- 合格点: {passing_score}点
-- 所要時間: {time_spent}分
-
-管理者より、フォローアップをお願いします。
-                    """
-                )
     
     st.markdown("---")
     
@@ -570,7 +850,7 @@ def show_result_page():
         if st.button("← ダッシュボードに戻る", use_container_width=True):
             st.session_state.current_page = 'dashboard'
             st.session_state.selected_theme = None
-            st.session_state.quiz_answers = {}
+            st.session_state.quiz_answers = None
             st.session_state.quiz_score = None
             st.rerun()
     
@@ -578,7 +858,7 @@ def show_result_page():
         if st.button("別のテーマを学習 →", use_container_width=True):
             st.session_state.current_page = 'dashboard'
             st.session_state.selected_theme = None
-            st.session_state.quiz_answers = {}
+            st.session_state.quiz_answers = None
             st.session_state.quiz_score = None
             st.rerun()
 